@@ -1,20 +1,81 @@
 from __future__ import annotations
 
-import io
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, BinaryIO, Dict, Tuple
 from uuid import UUID, uuid4
 
 import pandas as pd
-from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
+from fastapi import BackgroundTasks, Depends, FastAPI, File, HTTPException, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.schemas import ChartsResponse, PreviewResponse, SummaryResponse, UploadResponse
 from app.services.analysis import analyze_dataset
 from app.storage.memory import DatasetBundle, InMemoryDatasetStore
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_UPLOAD_BODY_SIZE = MAX_FILE_SIZE + 64 * 1024  # room for multipart boundaries and headers
+FILE_TOO_LARGE_DETAIL = "File too large. Maximum allowed size is 10MB."
+# Each worker also runs pyarrow's own CPU-sized thread pool, so leave cores spare.
+ANALYSIS_WORKERS = max((os.cpu_count() or 1) // 2, 1)
 
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Kopernik Analytics API", version="0.1.0")
+
+def _create_analysis_pool() -> ProcessPoolExecutor:
+    # Forking a multi-threaded process can deadlock
+    return ProcessPoolExecutor(
+        max_workers=ANALYSIS_WORKERS,
+        mp_context=multiprocessing.get_context("forkserver"),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Analysis is CPU bound; keep it off the event loop
+    app.state.analysis_pool = _create_analysis_pool()
+    try:
+        yield
+    finally:
+        app.state.analysis_pool.shutdown()
+
+
+app = FastAPI(
+    title="Kopernik Analytics API",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+
+class UploadSizeLimitMiddleware:
+    # Rejects oversized uploads from Content-Length before the body is read
+    def __init__(self, app: ASGIApp, max_body_size: int) -> None:
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == "/upload":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_body_size:
+                        response = ORJSONResponse(status_code=413, content={"detail": FILE_TOO_LARGE_DETAIL})
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+
+# Added before CORSMiddleware so the 413 carries CORS headers
+app.add_middleware(UploadSizeLimitMiddleware, max_body_size=MAX_UPLOAD_BODY_SIZE)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,63 +93,124 @@ def get_store() -> InMemoryDatasetStore:
     return store
 
 
-@app.post("/upload", response_model=UploadResponse)
+@app.post("/upload", response_model=UploadResponse, status_code=202)
 async def upload_dataset(
+    request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(..., description="CSV dataset"),
     store: InMemoryDatasetStore = Depends(get_store),
 ) -> UploadResponse:
     if file.content_type not in {"text/csv", "application/vnd.ms-excel", "application/csv"}:
         raise HTTPException(status_code=400, detail="Unsupported file type. Please upload a CSV file.")
 
-    content = await file.read()
-    if len(content) == 0:
+    # Parse the spooled upload in place
+    if file.size == 0:
         raise HTTPException(status_code=400, detail="Uploaded file is empty.")
 
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(status_code=413, detail="File too large. Maximum allowed size is 10MB.")
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=FILE_TOO_LARGE_DETAIL)
 
     try:
-        df = pd.read_csv(io.BytesIO(content))
+        file.file.seek(0)
+        df = _read_csv(file.file)
     except Exception as exc:  # pragma: no cover - pandas specific errors
         raise HTTPException(status_code=400, detail="Failed to parse CSV file.") from exc
 
-    summary, charts, preview, _column_types = analyze_dataset(df)
-
+    # Analyze after responding; the dataset endpoints return 425 until it finishes
     dataset_id = uuid4()
-    bundle = DatasetBundle(dataframe=df, summary=summary, charts=charts, preview=preview)
-    store.save_dataset(dataset_id, bundle)
+    store.mark_pending(dataset_id)
+    background_tasks.add_task(_analyze_in_background, dataset_id, df, store, request.app)
 
     return UploadResponse(dataset_id=str(dataset_id))
 
 
+async def _analyze_in_background(
+    dataset_id: UUID,
+    df: pd.DataFrame,
+    store: InMemoryDatasetStore,
+    app: FastAPI,
+) -> None:
+    try:
+        summary, charts, preview, _column_types = await _run_analysis(app, df)
+        bundle = DatasetBundle(
+            summary_json=summary.model_dump_json().encode(),
+            charts_json=charts.model_dump_json().encode(),
+            preview_json=preview.model_dump_json().encode(),
+        )
+        # save_dataset writes to disk
+        await run_in_threadpool(store.save_dataset, dataset_id, bundle)
+    except Exception:
+        logger.exception("Analysis failed for dataset %s", dataset_id)
+        store.mark_failed(dataset_id)
+
+
+async def _run_analysis(
+    app: FastAPI, df: pd.DataFrame
+) -> Tuple[SummaryResponse, ChartsResponse, PreviewResponse, Dict[str, str]]:
+    loop = asyncio.get_running_loop()
+    pool = app.state.analysis_pool
+    try:
+        return await loop.run_in_executor(pool, analyze_dataset, df)
+    except BrokenProcessPool:
+        # A worker died; replace the pool and retry once
+        logger.warning("Analysis pool is broken, restarting it")
+        if app.state.analysis_pool is pool:
+            app.state.analysis_pool = _create_analysis_pool()
+            pool.shutdown(wait=False)
+        return await loop.run_in_executor(app.state.analysis_pool, analyze_dataset, df)
+
+
 @app.get("/datasets/{dataset_id}/summary", response_model=SummaryResponse)
 def get_summary(
     dataset_id: UUID,
     store: InMemoryDatasetStore = Depends(get_store),
-) -> SummaryResponse:
+) -> Response:
     bundle = _get_dataset_bundle(store, dataset_id)
-    return bundle.summary
+    return Response(content=bundle.summary_json, media_type="application/json")
 
 
 @app.get("/datasets/{dataset_id}/charts", response_model=ChartsResponse)
 def get_charts(
     dataset_id: UUID,
     store: InMemoryDatasetStore = Depends(get_store),
-) -> ChartsResponse:
+) -> Response:
     bundle = _get_dataset_bundle(store, dataset_id)
-    return bundle.charts
+    return Response(content=bundle.charts_json, media_type="application/json")
 
 
 @app.get("/datasets/{dataset_id}/preview", response_model=PreviewResponse)
 def get_preview(
     dataset_id: UUID,
     store: InMemoryDatasetStore = Depends(get_store),
-) -> PreviewResponse:
+) -> Response:
     bundle = _get_dataset_bundle(store, dataset_id)
-    return bundle.preview
+    return Response(content=bundle.preview_json, media_type="application/json")
+
+
+def _read_csv(source: BinaryIO) -> pd.DataFrame:
+    # Multi-threaded parse; the result stays NumPy-backed for type inference
+    try:
+        df = pd.read_csv(source, engine="pyarrow")
+    except pd.errors.ParserError:
+        df = None
+
+    # The C engine pads short rows and renames duplicate headers (a, a.1)
+    if df is None or df.columns.has_duplicates:
+        source.seek(0)
+        df = pd.read_csv(source, engine="c", memory_map=False)
+    return df
 
 
 def _get_dataset_bundle(store: InMemoryDatasetStore, dataset_id: UUID) -> DatasetBundle:
+    if store.is_pending(dataset_id):
+        raise HTTPException(
+            status_code=425,
+            detail="Dataset is still being analyzed.",
+            headers={"Retry-After": "1"},
+        )
+    if store.has_failed(dataset_id):
+        raise HTTPException(status_code=422, detail="Failed to analyze dataset.")
+
     try:
         return store.get_dataset(dataset_id)
     except KeyError as exc:
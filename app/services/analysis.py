@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import math
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import re
+from datetime import date
+from typing import Dict, List, Optional, Pattern, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
 from app.schemas import (
     ChartCategoryTop5,
@@ -25,61 +29,116 @@ CATEGORY_RATIO_THRESHOLD = 0.4
 MAX_PREVIEW_ROWS = 20
 MAX_TEXT_LENGTH = 200
 MISSING_RATIO_THRESHOLD = 0.3
-
-
-def _safe_string(value: object) -> str:
-    if value is None or (isinstance(value, float) and math.isnan(value)):
-        return ""
-    if isinstance(value, (pd.Timestamp, datetime)):
-        return value.isoformat()
-    text = str(value)
-    if len(text) > MAX_TEXT_LENGTH:
-        return text[:MAX_TEXT_LENGTH] + "…"
-    return text
-
-
-def infer_column_type(series: pd.Series) -> str:
+INFERENCE_SAMPLE_SIZE = 200
+
+# Category labels and their counts, ordered by descending count.
+CategoryCounts = Tuple[np.ndarray, np.ndarray]
+
+# Date layouts and their candidate formats (month-first wins ties; () lets pandas infer)
+DATE_FORMATS: List[Tuple[Pattern[str], Tuple[str, ...]]] = [
+    (re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?$"), ("ISO8601",)),
+    (re.compile(r"^\d{4}-\d{1,2}-\d{1,2}$"), ("%Y-%m-%d",)),
+    (re.compile(r"^\d{4}[-/]\d{1,2}$"), ("%Y-%m", "%Y/%m")),
+    (re.compile(r"^\d{4}/\d{1,2}/\d{1,2}$"), ("%Y/%m/%d",)),
+    (re.compile(r"^\d{4}/\d{1,2}/\d{1,2} \d{1,2}:\d{2}$"), ("%Y/%m/%d %H:%M",)),
+    (re.compile(r"^\d{4}/\d{1,2}/\d{1,2} \d{1,2}:\d{2}:\d{2}$"), ("%Y/%m/%d %H:%M:%S",)),
+    (re.compile(r"^\d{4}/\d{1,2}/\d{1,2} \d{1,2}:\d{2}:\d{2}\.\d+$"), ("%Y/%m/%d %H:%M:%S.%f",)),
+    (re.compile(r"^\d{4}\.\d{1,2}\.\d{1,2}$"), ("%Y.%m.%d",)),
+    (re.compile(r"^\d{1,2}/\d{1,2}/\d{4}$"), ("%m/%d/%Y", "%d/%m/%Y")),
+    (re.compile(r"^\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}$"), ("%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M")),
+    (re.compile(r"^\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}:\d{2}$"), ("%m/%d/%Y %H:%M:%S", "%d/%m/%Y %H:%M:%S")),
+    (re.compile(r"^\d{1,2}-\d{1,2}-\d{4}$"), ("%d-%m-%Y", "%m-%d-%Y")),
+    (re.compile(r"^\d{1,2}\.\d{1,2}\.\d{4}$"), ("%d.%m.%Y",)),
+    (re.compile(r"(?i)^(?=.*\d{4})(?=.*\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b)[\w ,./:-]+$"), ()),
+]
+
+
+def infer_column_type(series: pd.Series) -> Tuple[str, Optional[pd.Series]]:
     if series.empty:
-        return "text"
+        return "text", None
 
     non_null = series.dropna()
     if non_null.empty:
-        return "text"
+        return "text", None
 
-    sample = non_null.head(200)
+    # Sample evenly spaced rows
+    sample = non_null
+    if len(non_null) > INFERENCE_SAMPLE_SIZE:
+        positions = np.linspace(0, len(non_null) - 1, INFERENCE_SAMPLE_SIZE).astype(int)
+        sample = non_null.iloc[positions]
 
     # Try date
-    parsed_dates = pd.to_datetime(sample, errors="coerce", infer_datetime_format=True)
-    if parsed_dates.notna().mean() >= DATE_THRESHOLD:
-        return "date"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "date", series
+
+    # Parsed once; summary and charts reuse it
+    parsed_dates = _parse_date_column(series, sample)
+    if parsed_dates is not None:
+        return "date", parsed_dates
 
     # Try numeric
     numeric = pd.to_numeric(sample, errors="coerce")
     if numeric.notna().mean() >= NUMBER_THRESHOLD:
-        return "number"
+        return "number", None
 
     # Category: relatively few unique values and short strings
     if sample.dtype == object or pd.api.types.is_string_dtype(sample):
         unique_count = sample.nunique(dropna=True)
-        avg_length = sample.astype(str).str.len().mean()
+        avg_length = sample.astype("string[pyarrow]").str.len().mean()
         if unique_count <= CATEGORY_MAX_UNIQUE and avg_length <= 50:
-            return "category"
+            return "category", None
+
+    return "text", None
+
+
+def _parse_date_column(series: pd.Series, sample: pd.Series) -> Optional[pd.Series]:
+    # Skip columns whose first value matches no known date layout
+    candidates = _date_format_candidates(sample.iloc[0])
+    if candidates is None:
+        return None
 
-    return "text"
+    best_format: Optional[str] = None
+    best_ratio = 0.0
+    for date_format in candidates:
+        ratio = pd.to_datetime(sample, format=date_format, errors="coerce").notna().mean()
+        if ratio > best_ratio:
+            best_format, best_ratio = date_format, ratio
 
+    if best_ratio < DATE_THRESHOLD:
+        # No explicit format fits; let pandas infer one
+        best_format = None
+        if pd.to_datetime(sample, errors="coerce").notna().mean() < DATE_THRESHOLD:
+            return None
 
-def infer_column_types(df: pd.DataFrame) -> Dict[str, str]:
+    return pd.to_datetime(series, format=best_format, errors="coerce")
+
+
+def _date_format_candidates(value: object) -> Optional[Tuple[str, ...]]:
+    if isinstance(value, date):
+        return ()  # the pyarrow engine reads YYYY-MM-DD columns as datetime.date
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    for pattern, date_formats in DATE_FORMATS:
+        if pattern.match(text):
+            return date_formats
+    return None
+
+
+def infer_column_types(df: pd.DataFrame) -> Dict[str, Tuple[str, Optional[pd.Series]]]:
     return {column: infer_column_type(df[column]) for column in df.columns}
 
 
 def compute_summary(
     df: pd.DataFrame,
     column_types: Dict[str, str],
+    parsed_dates: Dict[str, pd.Series],
+    category_counts: Dict[str, CategoryCounts],
 ) -> SummaryResponse:
     row_count, column_count = df.shape
 
-    latest_date = _find_latest_date(df, column_types)
-    top_category_summary = _find_top_category(df, column_types)
+    latest_date = _find_latest_date(parsed_dates)
+    top_category_summary = _find_top_category(df, column_types, category_counts)
     missing_columns = _find_missing_columns(df)
 
     return SummaryResponse(
@@ -91,72 +150,63 @@ def compute_summary(
     )
 
 
-def _find_latest_date(df: pd.DataFrame, column_types: Dict[str, str]) -> Optional[str]:
-    date_columns = [col for col, col_type in column_types.items() if col_type == "date"]
-    if not date_columns:
+def _find_latest_date(parsed_dates: Dict[str, pd.Series]) -> Optional[str]:
+    if not parsed_dates:
         return None
 
-    max_value: Optional[pd.Timestamp] = None
-    for column in date_columns:
-        parsed = pd.to_datetime(df[column], errors="coerce")
-        column_max = parsed.max()
-        if pd.isna(column_max):
-            continue
-        if max_value is None or column_max > max_value:
-            max_value = column_max
+    arrays = [pa.Array.from_pandas(parsed) for parsed in parsed_dates.values()]
+    if len({array.type for array in arrays}) == 1:
+        maxima = [pc.max(pa.concat_arrays(arrays))]
+    else:
+        # Different units or timezones: compare per-column maxima
+        maxima = [pc.max(array) for array in arrays]
 
-    if max_value is None:
+    values = [pd.Timestamp(value.as_py()) for value in maxima if value.is_valid]
+    if not values:
         return None
 
-    if isinstance(max_value, pd.Timestamp):
-        return max_value.normalize().isoformat()
-
-    return str(max_value)
+    # Compare naive timestamps as UTC
+    latest = max(values, key=lambda value: value if value.tz is None else value.tz_convert(None))
+    return latest.normalize().isoformat()
 
 
 def _find_top_category(
-    df: pd.DataFrame, column_types: Dict[str, str]
+    df: pd.DataFrame, column_types: Dict[str, str], category_counts: Dict[str, CategoryCounts]
 ) -> Optional[TopCategorySummary]:
     category_columns = [col for col, col_type in column_types.items() if col_type == "category"]
     if not category_columns:
         return None
 
-    selected_column = _select_best_category_column(df, category_columns)
+    selected_column = _select_best_category_column(df, category_columns, category_counts)
     if selected_column is None:
         return None
 
-    counts = df[selected_column].dropna()
-    if counts.empty:
-        return None
-
-    counts = counts.astype(str).value_counts()
-    if counts.empty:
+    labels, counts = _category_counts(df, selected_column, category_counts)
+    if len(counts) == 0:
         return None
 
-    top_label = counts.index[0]
-    top_count = counts.iloc[0]
+    top_label = labels[0]
+    top_count = counts[0]
     ratio = float(top_count / counts.sum())
 
     return TopCategorySummary(column=selected_column, value=str(top_label), ratio=ratio)
 
 
-def _select_best_category_column(df: pd.DataFrame, category_columns: List[str]) -> Optional[str]:
+def _select_best_category_column(
+    df: pd.DataFrame, category_columns: List[str], category_counts: Dict[str, CategoryCounts]
+) -> Optional[str]:
     if not category_columns:
         return None
 
     best_column = None
     best_score = -math.inf
     for column in category_columns:
-        counts = df[column].dropna()
-        if counts.empty:
-            continue
-
-        counts = counts.astype(str).value_counts()
+        _, counts = _category_counts(df, column, category_counts)
         unique_count = len(counts)
         if unique_count == 0:
             continue
 
-        top_ratio = counts.iloc[0] / counts.sum()
+        top_ratio = counts[0] / counts.sum()
         score = unique_count - (top_ratio * 2)  # prefer spread-out distributions
         if score > best_score:
             best_score = score
@@ -165,41 +215,52 @@ def _select_best_category_column(df: pd.DataFrame, category_columns: List[str])
     return best_column
 
 
+def _category_counts(df: pd.DataFrame, column: str, cache: Dict[str, CategoryCounts]) -> CategoryCounts:
+    # Descending counts; tied labels keep their order of first appearance
+    if column not in cache:
+        codes, uniques = pd.factorize(df[column].dropna().astype(str), sort=False)
+        counts = np.bincount(codes, minlength=len(uniques))
+        order = np.argsort(-counts, kind="stable")
+        cache[column] = (np.asarray(uniques, dtype=object)[order], counts[order])
+    return cache[column]
+
+
 def _find_missing_columns(df: pd.DataFrame) -> List[str]:
     if df.empty:
         return []
-    ratios = df.isna().mean()
-    missing_columns = [col for col, ratio in ratios.items() if ratio >= MISSING_RATIO_THRESHOLD]
-    return missing_columns
+    ratios = df.isna().to_numpy().mean(axis=0)
+    missing_idx = np.flatnonzero(ratios >= MISSING_RATIO_THRESHOLD)
+    return df.columns[missing_idx].tolist()
 
 
-def compute_charts(df: pd.DataFrame, column_types: Dict[str, str]) -> ChartsResponse:
-    category_chart = _build_category_top5_chart(df, column_types)
-    date_chart = _build_date_chart(df, column_types)
+def compute_charts(
+    df: pd.DataFrame,
+    column_types: Dict[str, str],
+    parsed_dates: Dict[str, pd.Series],
+    category_counts: Dict[str, CategoryCounts],
+) -> ChartsResponse:
+    category_chart = _build_category_top5_chart(df, column_types, category_counts)
+    date_chart = _build_date_chart(parsed_dates)
 
     return ChartsResponse(by_category_top5=category_chart, by_date=date_chart)
 
 
 def _build_category_top5_chart(
-    df: pd.DataFrame, column_types: Dict[str, str]
+    df: pd.DataFrame, column_types: Dict[str, str], category_counts: Dict[str, CategoryCounts]
 ) -> Optional[ChartCategoryTop5]:
     category_columns = [col for col, col_type in column_types.items() if col_type == "category"]
     if not category_columns:
         return None
 
-    selected_column = _select_best_category_column(df, category_columns)
+    selected_column = _select_best_category_column(df, category_columns, category_counts)
     if selected_column is None:
         return None
 
-    counts = df[selected_column].dropna()
-    if counts.empty:
-        return None
-
-    counts = counts.astype(str).value_counts().head(5)
-    if counts.empty:
+    labels, counts = _category_counts(df, selected_column, category_counts)
+    if len(counts) == 0:
         return None
 
-    data = [ChartDataPoint(label=str(label), value=int(count)) for label, count in counts.items()]
+    data = [ChartDataPoint(label=str(label), value=int(count)) for label, count in zip(labels[:5], counts[:5])]
 
     return ChartCategoryTop5(
         title=f"{selected_column}別の件数Top5",
@@ -210,22 +271,27 @@ def _build_category_top5_chart(
     )
 
 
-def _build_date_chart(df: pd.DataFrame, column_types: Dict[str, str]) -> Optional[ChartByDate]:
-    date_columns = [col for col, col_type in column_types.items() if col_type == "date"]
-    if not date_columns:
+def _build_date_chart(parsed_dates: Dict[str, pd.Series]) -> Optional[ChartByDate]:
+    if not parsed_dates:
         return None
 
-    selected_column = date_columns[0]
-    parsed = pd.to_datetime(df[selected_column], errors="coerce")
-    parsed = parsed.dropna()
+    selected_column = next(iter(parsed_dates))
+    parsed = parsed_dates[selected_column].dropna()
     if parsed.empty:
         return None
 
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_localize(None)  # bucket by local wall-clock day
+
     # Group by day and count
-    grouped = parsed.dt.floor("D").value_counts().sort_index()
+    days = parsed.to_numpy().astype("datetime64[D]").astype(np.int64)
+    first_day = days.min()
+    counts = np.bincount(days - first_day)
+    present = np.flatnonzero(counts)
+    labels = (present + first_day).astype("datetime64[D]").astype(str)
     data = [
-        ChartDatePoint(date=index.date().isoformat(), count=int(count))
-        for index, count in grouped.items()
+        ChartDatePoint(date=label, count=int(count))
+        for label, count in zip(labels, counts[present])
     ]
 
     return ChartByDate(
@@ -242,17 +308,41 @@ def compute_preview(df: pd.DataFrame, column_types: Dict[str, str]) -> PreviewRe
 
     columns = [PreviewColumn(name=col, type=column_types.get(col, "text")) for col in preview_df.columns]
 
-    rows: List[List[Optional[str]]] = []
-    for _, row in preview_df.iterrows():
-        serialized_row = [_safe_string(row[col]) for col in preview_df.columns]
-        rows.append(serialized_row)
+    if preview_df.columns.empty:
+        return PreviewResponse(columns=columns, rows=[[] for _ in preview_df.index])
+
+    serialized = pd.concat(
+        [_serialize_preview_column(preview_df.iloc[:, index]) for index in range(preview_df.shape[1])],
+        axis=1,
+    )
+    rows: List[List[Optional[str]]] = serialized.to_numpy(dtype=object).tolist()
 
     return PreviewResponse(columns=columns, rows=rows)
 
 
+def _serialize_preview_column(column: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(column):
+        text = column.dt.strftime("%Y-%m-%dT%H:%M:%S")
+        if column.dt.tz is not None:
+            # Keep the UTC offset as +HH:MM, like isoformat()
+            offset = column.dt.strftime("%z")
+            text = text + offset.str.slice(0, 3) + ":" + offset.str.slice(3)
+        return text.fillna("")
+
+    text = column.astype("string")
+    too_long = (text.str.len() > MAX_TEXT_LENGTH).fillna(False)
+    text = text.mask(too_long, text.str.slice(0, MAX_TEXT_LENGTH) + "…")
+    return text.fillna("")
+
+
 def analyze_dataset(df: pd.DataFrame) -> Tuple[SummaryResponse, ChartsResponse, PreviewResponse, Dict[str, str]]:
-    column_types = infer_column_types(df)
-    summary = compute_summary(df, column_types)
-    charts = compute_charts(df, column_types)
+    inferred = infer_column_types(df)
+    column_types = {column: col_type for column, (col_type, _) in inferred.items()}
+    parsed_dates = {column: parsed for column, (_, parsed) in inferred.items() if parsed is not None}
+
+    category_counts: Dict[str, CategoryCounts] = {}
+
+    summary = compute_summary(df, column_types, parsed_dates, category_counts)
+    charts = compute_charts(df, column_types, parsed_dates, category_counts)
     preview = compute_preview(df, column_types)
     return summary, charts, preview, column_types
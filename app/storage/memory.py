@@ -1,34 +1,166 @@
 from __future__ import annotations
 
+import itertools
+import tempfile
+import threading
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict
+from pathlib import Path
+from typing import Deque, Dict, List, Mapping, Optional, Set
 from uuid import UUID
 
-import pandas as pd
+from app.storage.sketch import FrequencySketch
 
-from app.schemas import ChartsResponse, PreviewResponse, SummaryResponse
+MAX_CACHED_DATASETS = 16
+MAX_STORED_DATASETS = 1024
+DEFAULT_SPILL_DIR = Path(tempfile.gettempdir()) / "kopernik"
 
 
 @dataclass
 class DatasetBundle:
-    dataframe: pd.DataFrame
-    summary: SummaryResponse
-    charts: ChartsResponse
-    preview: PreviewResponse
+    # Pre-serialized response bodies; bundles never change after upload.
+    summary_json: bytes
+    charts_json: bytes
+    preview_json: bytes
 
 
 class InMemoryDatasetStore:
-    def __init__(self) -> None:
-        self._datasets: Dict[UUID, DatasetBundle] = {}
+    def __init__(
+        self,
+        max_cached: int = MAX_CACHED_DATASETS,
+        spill_dir: Optional[Path] = None,
+        max_stored: int = MAX_STORED_DATASETS,
+    ) -> None:
+        # Copy-on-write snapshot so reads need no lock
+        self._datasets: Mapping[UUID, DatasetBundle] = {}
+        self._last_used: Dict[UUID, int] = {}
+        self._clock = itertools.count()
+        # W-TinyLFU: a small LRU window in front of a frequency-gated main region
+        self._window_size = max(max_cached // 8, 1)
+        self._main_size = max(max_cached - self._window_size, 0)
+        self._window: Set[UUID] = set()
+        self._main: Set[UUID] = set()
+        self._spill_dir = spill_dir or DEFAULT_SPILL_DIR
+        # Datasets written by this store, oldest first
+        self._max_stored = max_stored
+        self._stored: Deque[UUID] = deque()
+        self._sketch = FrequencySketch(max_cached)
+        self._lock = threading.Lock()
+        self._pending: Set[UUID] = set()
+        # Insertion-ordered, oldest first
+        self._failed: Dict[UUID, None] = {}
 
     def save_dataset(self, dataset_id: UUID, bundle: DatasetBundle) -> None:
-        self._datasets[dataset_id] = bundle
+        # Write through to disk
+        self._persist(dataset_id, bundle)
+        expired: List[UUID] = []
+        with self._lock:
+            self._sketch.increment(dataset_id)
+            self._admit(dataset_id, bundle)
+            self._stored.append(dataset_id)
+            while len(self._stored) > self._max_stored:
+                expired.append(self._stored.popleft())
+            if expired:
+                self._forget(expired)
+        self._pending.discard(dataset_id)
+        for expired_id in expired:
+            self._delete(expired_id)
+
+    def mark_pending(self, dataset_id: UUID) -> None:
+        self._pending.add(dataset_id)
+
+    def mark_failed(self, dataset_id: UUID) -> None:
+        self._failed[dataset_id] = None
+        if len(self._failed) > self._max_stored:
+            del self._failed[next(iter(self._failed))]
+        self._pending.discard(dataset_id)
+
+    def is_pending(self, dataset_id: UUID) -> bool:
+        return dataset_id in self._pending
+
+    def has_failed(self, dataset_id: UUID) -> bool:
+        return dataset_id in self._failed
 
     def get_dataset(self, dataset_id: UUID) -> DatasetBundle:
+        # Lock-free read path
+        self._sketch.increment(dataset_id)
+        bundle = self._datasets.get(dataset_id)
+        if bundle is not None:
+            self._last_used[dataset_id] = next(self._clock)
+            return bundle
+
+        bundle = self._load(dataset_id)
+        with self._lock:
+            self._admit(dataset_id, bundle)
+        return bundle
+
+    def dataset_exists(self, dataset_id: UUID) -> bool:
+        if dataset_id in self._datasets:
+            return True
+        return self._json_path(dataset_id, "preview").exists()
+
+    def _admit(self, dataset_id: UUID, bundle: DatasetBundle) -> None:
+        datasets = dict(self._datasets)
+        datasets[dataset_id] = bundle
+        self._last_used[dataset_id] = next(self._clock)
+        if dataset_id not in self._main:
+            self._window.add(dataset_id)
+
+        if len(self._window) > self._window_size:
+            candidate_id = min(self._window, key=self._recency)
+            self._window.discard(candidate_id)
+            evicted_id: Optional[UUID] = candidate_id
+            if len(self._main) < self._main_size:
+                self._main.add(candidate_id)
+                evicted_id = None
+            elif self._main:
+                # Admit the candidate only if it is used more often than the victim
+                victim_id = min(self._main, key=self._recency)
+                if self._sketch.estimate(candidate_id) > self._sketch.estimate(victim_id):
+                    self._main.discard(victim_id)
+                    self._main.add(candidate_id)
+                    evicted_id = victim_id
+            if evicted_id is not None:
+                del datasets[evicted_id]
+
+        self._last_used = {key: self._last_used.get(key, -1) for key in datasets}
+        self._datasets = datasets
+
+    def _forget(self, dataset_ids: List[UUID]) -> None:
+        datasets = dict(self._datasets)
+        for dataset_id in dataset_ids:
+            datasets.pop(dataset_id, None)
+            self._last_used.pop(dataset_id, None)
+            self._window.discard(dataset_id)
+            self._main.discard(dataset_id)
+        self._datasets = datasets
+
+    def _recency(self, dataset_id: UUID) -> int:
+        return self._last_used.get(dataset_id, -1)
+
+    def _persist(self, dataset_id: UUID, bundle: DatasetBundle) -> None:
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        self._json_path(dataset_id, "summary").write_bytes(bundle.summary_json)
+        self._json_path(dataset_id, "charts").write_bytes(bundle.charts_json)
+        # Written last; marks the dataset as complete
+        self._json_path(dataset_id, "preview").write_bytes(bundle.preview_json)
+
+    def _delete(self, dataset_id: UUID) -> None:
+        # Preview first, so the dataset stops counting as complete
+        for name in ("preview", "summary", "charts"):
+            self._json_path(dataset_id, name).unlink(missing_ok=True)
+
+    def _load(self, dataset_id: UUID) -> DatasetBundle:
         try:
-            return self._datasets[dataset_id]
-        except KeyError as exc:
+            preview_json = self._json_path(dataset_id, "preview").read_bytes()
+        except FileNotFoundError as exc:
             raise KeyError("Dataset not found") from exc
 
-    def dataset_exists(self, dataset_id: UUID) -> bool:
-        return dataset_id in self._datasets
+        return DatasetBundle(
+            summary_json=self._json_path(dataset_id, "summary").read_bytes(),
+            charts_json=self._json_path(dataset_id, "charts").read_bytes(),
+            preview_json=preview_json,
+        )
+
+    def _json_path(self, dataset_id: UUID, name: str) -> Path:
+        return self._spill_dir / f"{dataset_id}.{name}.json"
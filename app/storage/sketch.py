@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from typing import Hashable, List
+
+MAX_COUNT = 15  # 4-bit counters
+SKETCH_DEPTH = 4
+_MASK64 = (1 << 64) - 1
+_GOLDEN_RATIO64 = 0x9E3779B97F4A7C15
+
+
+# Count-Min sketch of recent access frequency, used for TinyLFU cache admission.
+class FrequencySketch:
+    def __init__(self, capacity: int) -> None:
+        self._width = max(16 * capacity, 16)
+        self._rows = [bytearray(self._width) for _ in range(SKETCH_DEPTH)]
+        self._sample_size = 10 * self._width
+        self._additions = 0
+
+    def increment(self, key: Hashable) -> None:
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < MAX_COUNT:
+                row[index] += 1
+
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def estimate(self, key: Hashable) -> int:
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def _indexes(self, key: Hashable) -> List[int]:
+        # Double hashing from one mixed 64-bit hash
+        mixed = ((hash(key) & _MASK64) * _GOLDEN_RATIO64) & _MASK64
+        low, high = mixed & 0xFFFFFFFF, (mixed >> 32) | 1
+        return [(low + depth * high) % self._width for depth in range(SKETCH_DEPTH)]
+
+    def _age(self) -> None:
+        # Halve every counter so old popularity fades
+        for row in self._rows:
+            row[:] = bytes(count >> 1 for count in row)
+        self._additions //= 2
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import io
+
+import pandas as pd
+import pytest
+
+from app.services.analysis import analyze_dataset, infer_column_type
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        ["2024-01-05", "2024-02-01", "2024-12-25"],
+        ["2024-1-5", "2024-2-1", "2024-12-25"],
+        ["2024-01", "2024-02", "2024-12"],
+        ["2024-01-05 10:00:00", "2024-02-01 11:30:00", "2024-12-25 00:00:00"],
+        ["2024-01-05T10:00:00Z", "2024-02-01T11:30:00Z", "2024-12-25T00:00:00Z"],
+        ["2024/1/5", "2024/2/1", "2024/12/25"],
+        ["2024/01/05 10:00:00.123", "2024/02/01 11:30:00.5", "2024/12/25 00:00:00.000"],
+        ["2024.01.05", "2024.02.01", "2024.12.25"],
+        ["01/05/2024", "02/01/2024", "12/25/2024"],
+        ["25/12/2024", "26/12/2024", "27/12/2024"],
+        ["25-12-2024", "26-12-2024", "27-12-2024"],
+        ["01/05/2024 10:00", "02/01/2024 11:30", "12/25/2024 00:00"],
+        ["Jan 5, 2024", "Feb 1, 2024", "Dec 25, 2024"],
+    ],
+)
+def test_infer_column_type_detects_date_layouts(values):
+    column_type, parsed = infer_column_type(pd.Series(values, dtype=object))
+
+    assert column_type == "date"
+    assert parsed is not None
+    assert parsed.notna().all()
+
+
+def test_infer_column_type_reads_day_first_dates_day_first():
+    _, parsed = infer_column_type(pd.Series(["25/12/2024", "01/02/2024"], dtype=object))
+
+    assert parsed.dt.strftime("%Y-%m-%d").tolist() == ["2024-12-25", "2024-02-01"]
+
+
+@pytest.mark.parametrize(
+    ("values", "expected"),
+    [
+        ([1, 2, 3], "number"),
+        (["12", "13", "14"], "number"),
+        (["Tokyo", "Osaka", "Tokyo"], "category"),
+    ],
+)
+def test_infer_column_type_does_not_treat_other_columns_as_dates(values, expected):
+    column_type, parsed = infer_column_type(pd.Series(values))
+
+    assert column_type == expected
+    assert parsed is None
+
+
+def test_infer_column_type_samples_the_whole_column():
+    values = [str(index) for index in range(250)] + [f"note {index}" for index in range(149)]
+
+    column_type, _ = infer_column_type(pd.Series(values, dtype=object))
+
+    assert column_type != "number"
+
+
+def test_analyze_dataset_uses_iso_date_column_read_by_pyarrow():
+    content = b"date,amount,cat\n2024-01-01,1,a\n2024-01-03,2,b\n2024-01-03,3,a\n"
+    df = pd.read_csv(io.BytesIO(content), engine="pyarrow")
+
+    summary, charts, _preview, column_types = analyze_dataset(df)
+
+    assert column_types["date"] == "date"
+    assert summary.latest_date == "2024-01-03T00:00:00"
+    assert summary.top_category is not None
+    assert summary.top_category.column == "cat"
+    assert charts.by_date is not None
+    assert [(point.date, point.count) for point in charts.by_date.data] == [
+        ("2024-01-01", 1),
+        ("2024-01-03", 2),
+    ]
+
+
+def test_analyze_dataset_preview_keeps_utc_offset():
+    df = pd.DataFrame(
+        {
+            "utc": pd.to_datetime(["2024-01-01T00:00:00Z", None], utc=True),
+            "tokyo": pd.to_datetime(["2024-01-01T09:00:00+09:00", "2024-01-02T09:00:00+09:00"]),
+            "naive": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+        }
+    )
+
+    _summary, _charts, preview, _column_types = analyze_dataset(df)
+
+    assert preview.rows == [
+        ["2024-01-01T00:00:00+00:00", "2024-01-01T09:00:00+09:00", "2024-01-01T00:00:00"],
+        ["", "2024-01-02T09:00:00+09:00", "2024-01-02T00:00:00"],
+    ]
+
+
+def test_analyze_dataset_latest_date_keeps_column_timezone():
+    df = pd.DataFrame(
+        {
+            "tokyo": pd.to_datetime(["2024-01-01T12:00:00+09:00", "2024-01-02T01:00:00+09:00"]),
+            "utc": pd.to_datetime(["2024-01-01T00:00:00Z", "2024-01-01T10:00:00Z"], utc=True),
+        }
+    )
+
+    summary, _charts, _preview, _column_types = analyze_dataset(df)
+
+    assert summary.latest_date == "2024-01-02T00:00:00+09:00"
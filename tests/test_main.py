@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import io
+from concurrent.futures import Executor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from uuid import uuid4
+
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.main import FILE_TOO_LARGE_DETAIL, MAX_UPLOAD_BODY_SIZE, _analyze_in_background, _read_csv, app, store
+from app.storage.memory import InMemoryDatasetStore
+
+
+def test_read_csv_pads_short_rows():
+    df = _read_csv(io.BytesIO(b"a,b,c\n1,2,3\n4,5\n"))
+
+    assert df.shape == (2, 3)
+    assert pd.isna(df.loc[1, "c"])
+
+
+def test_read_csv_renames_duplicate_headers():
+    df = _read_csv(io.BytesIO(b"a,a\n1,2\n"))
+
+    assert df.columns.tolist() == ["a", "a.1"]
+
+
+def test_read_csv_rejects_malformed_input():
+    with pytest.raises(pd.errors.ParserError):
+        _read_csv(io.BytesIO(b'a,b\n"1,2\n'))
+
+
+def test_upload_rejects_oversized_body_before_parsing():
+    client = TestClient(app)
+    body = b"a,b\n" + b"1,2\n" * (MAX_UPLOAD_BODY_SIZE // 4 + 1)
+
+    response = client.post(
+        "/upload",
+        files={"file": ("data.csv", body, "text/csv")},
+        headers={"Origin": "http://example.com"},
+    )
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": FILE_TOO_LARGE_DETAIL}
+    assert response.headers["access-control-allow-origin"] == "*"
+
+
+def test_size_limit_does_not_affect_other_routes():
+    client = TestClient(app)
+
+    response = client.get(f"/datasets/{uuid4()}/summary")
+
+    assert response.status_code == 404
+
+
+def test_upload_is_analyzed_in_the_background():
+    body = b"date,amount,cat\n2024-01-01,1,a\n2024-01-03,2,b\n"
+
+    with TestClient(app) as client:
+        response = client.post("/upload", files={"file": ("data.csv", body, "text/csv")})
+        dataset_id = response.json()["dataset_id"]
+        results = [client.get(f"/datasets/{dataset_id}/{name}") for name in ("summary", "charts", "preview")]
+
+    assert response.status_code == 202
+    assert [result.status_code for result in results] == [200, 200, 200]
+    assert results[0].json()["row_count"] == 2
+    assert results[0].json()["latest_date"] == "2024-01-03T00:00:00"
+
+
+def test_pending_dataset_answers_425_with_retry_after():
+    dataset_id = uuid4()
+    store.mark_pending(dataset_id)
+
+    response = TestClient(app).get(f"/datasets/{dataset_id}/summary")
+
+    assert response.status_code == 425
+    assert response.headers["retry-after"] == "1"
+
+
+def test_failed_dataset_answers_422():
+    dataset_id = uuid4()
+    store.mark_pending(dataset_id)
+    store.mark_failed(dataset_id)
+
+    response = TestClient(app).get(f"/datasets/{dataset_id}/preview")
+
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Failed to analyze dataset."}
+
+
+def test_upload_serves_large_file_read_by_c_engine_with_mixed_columns():
+    # Over the C engine's low_memory chunk size, so column "a" ends up mixing int and str.
+    rows = "".join(f"{index},x\n" for index in range(300_000))
+    body = f"a,b\n{rows}foo,y\n1\n".encode()
+
+    with TestClient(app) as client:
+        response = client.post("/upload", files={"file": ("data.csv", body, "text/csv")})
+        dataset_id = response.json()["dataset_id"]
+        summary = client.get(f"/datasets/{dataset_id}/summary")
+
+    assert response.status_code == 202
+    assert summary.status_code == 200
+    assert summary.json()["row_count"] == 300_002
+
+
+class _BrokenPool(Executor):
+    def submit(self, fn, /, *args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+
+def test_broken_analysis_pool_is_replaced_and_retried(tmp_path, monkeypatch):
+    replacement = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(main, "_create_analysis_pool", lambda: replacement)
+    fake_app = FastAPI()
+    fake_app.state.analysis_pool = _BrokenPool()
+    dataset_store = InMemoryDatasetStore(spill_dir=tmp_path)
+    dataset_id = uuid4()
+    dataset_store.mark_pending(dataset_id)
+
+    with replacement:
+        asyncio.run(_analyze_in_background(dataset_id, pd.DataFrame({"a": [1, 2]}), dataset_store, fake_app))
+
+    assert fake_app.state.analysis_pool is replacement
+    assert not dataset_store.has_failed(dataset_id)
+    assert dataset_store.get_dataset(dataset_id).summary_json
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from uuid import uuid4
+
+import pytest
+
+from app.storage.memory import DatasetBundle, InMemoryDatasetStore
+
+
+def _bundle(label: str = "x") -> DatasetBundle:
+    return DatasetBundle(
+        summary_json=f'{{"summary":"{label}"}}'.encode(),
+        charts_json=f'{{"charts":"{label}"}}'.encode(),
+        preview_json=f'{{"preview":"{label}"}}'.encode(),
+    )
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = InMemoryDatasetStore(max_cached=16, spill_dir=tmp_path, max_stored=64)
+    loads = []
+    original_load = store._load
+
+    def counting_load(dataset_id):
+        loads.append(dataset_id)
+        return original_load(dataset_id)
+
+    monkeypatch.setattr(store, "_load", counting_load)
+    store.loads = loads
+    return store
+
+
+def test_fresh_uploads_are_served_from_memory_after_cache_fills(store):
+    for _ in range(40):
+        dataset_id = uuid4()
+        store.save_dataset(dataset_id, _bundle())
+        for _ in range(3):  # summary, charts, preview
+            store.get_dataset(dataset_id)
+
+    assert store.loads == []
+
+
+def test_scan_over_cold_datasets_keeps_hot_datasets_resident(store):
+    hot = [uuid4() for _ in range(8)]
+    for dataset_id in hot:
+        store.save_dataset(dataset_id, _bundle())
+    for _ in range(5):
+        for dataset_id in hot:
+            store.get_dataset(dataset_id)
+
+    for _ in range(50):
+        store.save_dataset(uuid4(), _bundle())
+
+    for dataset_id in hot:
+        store.get_dataset(dataset_id)
+    assert store.loads == []
+
+
+def test_evicted_dataset_is_reloaded_from_disk(store):
+    first = uuid4()
+    store.save_dataset(first, _bundle("first"))
+    for _ in range(40):
+        dataset_id = uuid4()
+        store.save_dataset(dataset_id, _bundle())
+        for _ in range(3):
+            store.get_dataset(dataset_id)
+
+    bundle = store.get_dataset(first)
+
+    assert store.loads == [first]
+    assert bundle.summary_json == b'{"summary":"first"}'
+    assert bundle.preview_json == b'{"preview":"first"}'
+
+
+def test_unknown_dataset_raises_key_error(store):
+    with pytest.raises(KeyError):
+        store.get_dataset(uuid4())
+
+
+def test_oldest_datasets_are_deleted_beyond_max_stored(store, tmp_path):
+    dataset_ids = [uuid4() for _ in range(70)]
+    for dataset_id in dataset_ids:
+        store.save_dataset(dataset_id, _bundle())
+
+    for dataset_id in dataset_ids[:6]:
+        assert not store.dataset_exists(dataset_id)
+        with pytest.raises(KeyError):
+            store.get_dataset(dataset_id)
+    assert store.get_dataset(dataset_ids[6]).summary_json == b'{"summary":"x"}'
+    assert len(list(tmp_path.iterdir())) == 64 * 3
+
+
+def test_only_the_most_recent_failures_are_remembered(store):
+    dataset_ids = [uuid4() for _ in range(70)]
+    for dataset_id in dataset_ids:
+        store.mark_pending(dataset_id)
+        store.mark_failed(dataset_id)
+
+    assert not any(store.has_failed(dataset_id) for dataset_id in dataset_ids[:6])
+    assert all(store.has_failed(dataset_id) for dataset_id in dataset_ids[6:])
+    assert not any(store.is_pending(dataset_id) for dataset_id in dataset_ids)